@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from planner_service import PlannerService
+
+
+def make_profile(i, distinct):
+    # Distinct payloads differ on every request, so nothing can be coalesced
+    return {
+        'age': 25,
+        'gender': 'Male' if i % 2 else 'Female',
+        'height': 170,
+        'weight': 60 + (i % 8000000) / 100000 if distinct else 70,
+        'activity_level': 'Moderately Active',
+        'goal': 'Weight Loss',
+        'diet_preference': 'No Preference',
+        'meal_frequency': 4,
+        'allergies': '',
+    }
+
+
+async def send(reader, writer, path, payload):
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    writer.write(
+        f'POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    response = json.loads(await reader.readexactly(length))
+    return status, response
+
+
+async def client(port, path, deadline, offset, distinct, latencies, statuses):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status, response = await send(reader, writer, path, make_profile(i, distinct))
+            statuses[status] = statuses.get(status, 0) + 1
+            # Rejected requests (503) are counted but kept out of the latency figures
+            if status == 200:
+                if 'target_calories' not in response:
+                    raise RuntimeError(f'unexpected response: {response}')
+                latencies.append(time.perf_counter() - started)
+            i += 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run(args):
+    service = PlannerService(workers=args.workers, queue_size=args.queue_size)
+    await service.start('127.0.0.1', 0)
+    try:
+        # Warm up every worker so process start-up is not counted
+        await asyncio.gather(*[service.submit(args.endpoint, make_profile(i, True)) for i in range(service.workers)])
+
+        latencies = []
+        statuses = {}
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*[
+            client(service.port, args.endpoint, deadline, n * 100000, not args.identical, latencies, statuses)
+            for n in range(args.connections)
+        ])
+        elapsed = time.perf_counter() - started
+    finally:
+        await service.close()
+
+    total = len(latencies)
+    latencies.sort()
+    rps = total / elapsed
+    print(f'Endpoint:          {args.endpoint} ({"identical" if args.identical else "distinct"} payloads)')
+    print(f'Connections:       {args.connections}')
+    print(f'Workers:           {service.workers}')
+    print(f'Completed:         {total} in {elapsed:.2f}s')
+    print(f'Status codes:      {dict(sorted(statuses.items()))}')
+    print(f'Throughput:        {rps:.1f} req/s')
+    # Only the planning processes are counted, not the process running the event loop
+    print(f'Per planning core: {rps / service.workers:.1f} req/s (event-loop process not counted)')
+    if latencies:
+        print(f'Latency p50:       {statistics.median(latencies) * 1000:.2f} ms')
+        print(f'Latency p95:       {latencies[int(total * 0.95) - 1] * 1000:.2f} ms')
+        print(f'Latency p99:       {latencies[int(total * 0.99) - 1] * 1000:.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline throughput/latency benchmark for planner_service')
+    parser.add_argument('--endpoint', default='/plan', choices=['/plan', '/calories'])
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--workers', type=int, default=None, help='planning processes (default: CPU count)')
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--identical', action='store_true',
+                        help='send the same payload everywhere, which measures request coalescing')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+import streamlit.logger
+from streamlit import config as streamlit_config
+
+# diet_workout_app sets up its Streamlit page on import, which only warns outside `streamlit run`.
+# This runs again in every spawned worker, since they re-import this module to find their jobs.
+# Moving the planning functions out of the Streamlit module would remove the need for it.
+streamlit_config.set_option('global.showWarningOnDirectExecution', False)
+streamlit_config.set_option('logger.level', 'error')
+streamlit.logger.set_log_level('error')
+
+from diet_workout_app import (
+    create_nutrition_database,
+    calculate_calories,
+    calculate_macros,
+    generate_meal_plan,
+    generate_workout_plan,
+    generate_grocery_list,
+)
+
+logger = logging.getLogger(__name__)
+
+# Fields returned for every food in a meal plan
+FOOD_FIELDS = ['food_name', 'calories_per_serving', 'protein_g', 'carbs_g', 'fat_g', 'meal_type', 'diet_type']
+
+PROFILE_FIELDS = {
+    'age': (int, float),
+    'gender': str,
+    'height': (int, float),
+    'weight': (int, float),
+    'activity_level': str,
+    'goal': str,
+}
+
+MEAL_FIELDS = {
+    'diet_preference': str,
+    'meal_frequency': int,
+}
+
+TARGET_FIELDS = {
+    'target_calories': (int, float),
+    'protein_target': (int, float),
+    'carbs_target': (int, float),
+    'fat_target': (int, float),
+}
+
+# Allowed values for numeric fields - the profile bounds mirror the sidebar inputs in the app
+FIELD_RANGES = {
+    'age': (16, 80),
+    'height': (140, 220),
+    'weight': (40, 150),
+    'meal_frequency': (3, 6),
+    'target_calories': (1, 10000),
+    'protein_target': (0, 1000),
+    'carbs_target': (0, 1000),
+    'fat_target': (0, 1000),
+}
+
+# Diet types offered by the app's sidebar
+DIET_PREFERENCES = ['no preference', 'vegetarian', 'non-vegetarian', 'vegan']
+
+
+# Compact JSON encoding shared by every response
+def dumps(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def error_body(message):
+    return dumps({'error': message})
+
+
+def reject_constant(name):
+    raise ValueError(f'{name} is not allowed')
+
+
+# Parse a request body, refusing the NaN/Infinity literals json.loads accepts by default
+def loads(body):
+    return json.loads(body, parse_constant=reject_constant)
+
+
+def request_key(path, params):
+    return path + '\n' + json.dumps(params, sort_keys=True, separators=(',', ':'))
+
+
+# Convert numpy scalars from the foods dataframe into plain Python values
+def to_native(value):
+    return value.item() if hasattr(value, 'item') else value
+
+
+def meal_plan_to_dict(meal_plan):
+    return {
+        meal_type: {field: to_native(food_info[field]) for field in FOOD_FIELDS}
+        for meal_type, food_info in meal_plan.items()
+    }
+
+
+# generate_meal_plan matches allergy keywords as regex patterns, so free text like "c++" must be escaped
+def escape_allergies(allergies):
+    return ','.join(re.escape(keyword.strip()) for keyword in allergies.split(','))
+
+
+def build_meal_plan(params, target_calories, protein_target, carbs_target, fat_target):
+    meal_plan = generate_meal_plan(
+        create_nutrition_database(), target_calories, protein_target, carbs_target, fat_target,
+        params['diet_preference'], params['meal_frequency'], escape_allergies(params.get('allergies', ''))
+    )
+    return meal_plan_to_dict(meal_plan)
+
+
+# Planning jobs - these run inside the executor, so they must stay module level
+def plan_calories(params):
+    target_calories, bmr = calculate_calories(
+        params['age'], params['gender'], params['height'], params['weight'],
+        params['activity_level'], params['goal']
+    )
+    return {'target_calories': target_calories, 'bmr': bmr}
+
+
+def plan_meals(params):
+    meal_plan = build_meal_plan(
+        params, params['target_calories'], params['protein_target'],
+        params['carbs_target'], params['fat_target']
+    )
+    return {'meal_plan': meal_plan}
+
+
+def plan_workouts(params):
+    return {'workout_plan': generate_workout_plan(params['goal'], params.get('activity_level', ''))}
+
+
+def plan_groceries(params):
+    # Sorted so identical meal plans give identical bytes in every worker
+    return {'grocery_list': sorted(generate_grocery_list(params['meal_plan']))}
+
+
+def plan_everything(params):
+    target_calories, bmr = calculate_calories(
+        params['age'], params['gender'], params['height'], params['weight'],
+        params['activity_level'], params['goal']
+    )
+    protein_target, carbs_target, fat_target = calculate_macros(target_calories, params['goal'], params['weight'])
+    meal_plan = build_meal_plan(params, target_calories, protein_target, carbs_target, fat_target)
+    return {
+        'target_calories': target_calories,
+        'bmr': bmr,
+        'bmi': round(params['weight'] / ((params['height'] / 100) ** 2), 1),
+        'macros': {'protein_g': protein_target, 'carbs_g': carbs_target, 'fat_g': fat_target},
+        'meal_plan': meal_plan,
+        'workout_plan': generate_workout_plan(params['goal'], params['activity_level']),
+        'grocery_list': sorted(generate_grocery_list(meal_plan)),
+    }
+
+
+# Endpoint -> (planning job, required fields and their types)
+ENDPOINTS = {
+    '/calories': (plan_calories, PROFILE_FIELDS),
+    '/meal-plan': (plan_meals, {**TARGET_FIELDS, **MEAL_FIELDS}),
+    '/workout-plan': (plan_workouts, {'goal': str}),
+    '/grocery-list': (plan_groceries, {'meal_plan': dict}),
+    '/plan': (plan_everything, {**PROFILE_FIELDS, **MEAL_FIELDS}),
+}
+
+
+def validate(params, fields):
+    if not isinstance(params, dict):
+        return 'request body must be a JSON object'
+    for name, expected in fields.items():
+        if name not in params:
+            return f'missing field: {name}'
+        value = params[name]
+        # bool is a subclass of int, but true/false is never a valid number here
+        if isinstance(value, bool) or not isinstance(value, expected):
+            return f'invalid field: {name}'
+        # NaN and infinity fail the range check as well
+        if name in FIELD_RANGES:
+            low, high = FIELD_RANGES[name]
+            if not low <= value <= high:
+                return f'invalid field: {name} (must be between {low} and {high})'
+    if 'diet_preference' in fields and params['diet_preference'].lower() not in DIET_PREFERENCES:
+        return 'invalid field: diet_preference'
+    if 'allergies' in params and not isinstance(params['allergies'], str):
+        return 'invalid field: allergies'
+    if 'meal_plan' in fields:
+        for food_info in params['meal_plan'].values():
+            if not isinstance(food_info, dict) or not isinstance(food_info.get('food_name'), str):
+                return 'invalid field: meal_plan'
+    return None
+
+
+class PlannerService:
+    """Asyncio JSON service for the planner.
+
+    Planning runs in an executor fed from a bounded queue. Concurrent
+    requests with identical parameters share one computation, and a full
+    queue is answered with 503 instead of buffering without limit.
+    ``queue_size`` bounds the plans waiting for a worker, and a batch that
+    does not fit in the free part of the queue is rejected as a whole.
+    """
+
+    def __init__(self, executor=None, workers=None, queue_size=64, max_batch=32,
+                 max_body=64 * 1024, keep_alive_timeout=15.0, shutdown_timeout=5.0):
+        if workers is None and executor is not None:
+            workers = getattr(executor, '_max_workers', None)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.max_body = max_body
+        self.keep_alive_timeout = keep_alive_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self._own_executor = executor is None
+        self._queue = None
+        self._inflight = {}
+        self._dispatchers = []
+        self._writers = set()
+        # Requests between reading their body and writing their response
+        self._active_requests = 0
+        self._requests_done = asyncio.Event()
+        self._requests_done.set()
+        self._server = None
+        self._closing = False
+
+    async def start(self, host='127.0.0.1', port=8502):
+        if self.executor is None:
+            # Forking from inside a running event loop can leave the pool waiting on workers forever
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        # One dispatcher per worker keeps the executor busy without a hidden backlog
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+
+        # Answer everything still queued or running so no waiter is left hanging
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+        for future in self._inflight.values():
+            if not future.done():
+                future.set_result((503, error_body('planner is shutting down')))
+        self._inflight.clear()
+        # Let the waiting connections write their 503 before the sockets go away
+        try:
+            await asyncio.wait_for(self._requests_done.wait(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Closing with %d responses still unsent', self._active_requests)
+
+        if self._server is not None:
+            # Idle keep-alive connections would otherwise hold wait_closed() open
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, job, params, future = await self._queue.get()
+            try:
+                result = await loop.run_in_executor(self.executor, job, params)
+                outcome = (200, dumps(result))
+            except Exception:
+                logger.exception('Planning failed for %s', key.split('\n', 1)[0])
+                outcome = (500, error_body('planning failed'))
+            finally:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+                self._queue.task_done()
+            if not future.done():
+                future.set_result(outcome)
+
+    def _enqueue(self, path, params):
+        # Returns a finished (status, body) or the future of the shared computation
+        if path not in ENDPOINTS:
+            return 404, error_body(f'unknown endpoint: {path}')
+        job, fields = ENDPOINTS[path]
+        problem = validate(params, fields)
+        if problem:
+            return 400, error_body(problem)
+        if self._closing:
+            return 503, error_body('planner is shutting down')
+
+        key = request_key(path, params)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            try:
+                self._queue.put_nowait((key, job, params, future))
+            except asyncio.QueueFull:
+                return 503, error_body('planner is busy, retry shortly')
+            self._inflight[key] = future
+        return future
+
+    async def _wait(self, outcome):
+        if isinstance(outcome, tuple):
+            return outcome
+        # Shielded so a client hanging up does not cancel a shared computation
+        return await asyncio.shield(outcome)
+
+    async def submit(self, path, params):
+        """Run one planning request and return ``(status, body_bytes)``."""
+        return await self._wait(self._enqueue(path, params))
+
+    async def submit_batch(self, payload):
+        if not isinstance(payload, dict) or not isinstance(payload.get('requests'), list):
+            return 400, error_body('batch body must be {"requests": [...]}')
+        items = payload['requests']
+        if len(items) > self.max_batch:
+            return 413, error_body(f'batch is limited to {self.max_batch} requests')
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get('endpoint'), str):
+                return 400, error_body('each batch request needs an "endpoint"')
+
+        # Count the queue slots the batch needs so it is either queued whole or refused
+        needed = set()
+        for item in items:
+            path, params = item['endpoint'], item.get('params')
+            if path in ENDPOINTS and validate(params, ENDPOINTS[path][1]) is None:
+                key = request_key(path, params)
+                if key not in self._inflight:
+                    needed.add(key)
+        if len(needed) > self._queue.maxsize - self._queue.qsize():
+            return 503, error_body('planner is busy, retry shortly')
+
+        outcomes = [self._enqueue(item['endpoint'], item.get('params')) for item in items]
+        results = await asyncio.gather(*[self._wait(outcome) for outcome in outcomes])
+        # Splice the already encoded bodies instead of decoding and re-encoding them
+        parts = [b'{"status":%d,"body":%s}' % (status, body) for status, body in results]
+        return 200, b'{"results":[' + b','.join(parts) + b']}'
+
+    async def route(self, method, path, body):
+        if path == '/health':
+            if method != 'GET':
+                return 405, error_body('use GET')
+            return 200, dumps({
+                'status': 'ok',
+                'queued': self._queue.qsize(),
+                'inflight': len(self._inflight),
+                'workers': self.workers,
+            })
+        if path != '/batch' and path not in ENDPOINTS:
+            return 404, error_body(f'unknown endpoint: {path}')
+        if method != 'POST':
+            return 405, error_body('use POST')
+        try:
+            payload = loads(body or b'{}')
+        except (ValueError, RecursionError):
+            return 400, error_body('request body is not valid JSON')
+        if path == '/batch':
+            return await self.submit_batch(payload)
+        return await self.submit(path, payload)
+
+    async def _handle_connection(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.keep_alive_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(http_response(431, error_body('request headers too large'), False))
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ')
+                except ValueError:
+                    writer.write(http_response(400, error_body('malformed request line'), False))
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+
+                if 'transfer-encoding' in headers:
+                    writer.write(http_response(411, error_body('send the body with a Content-Length header'), False))
+                    break
+                try:
+                    length = int(headers.get('content-length', '0'))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > self.max_body:
+                    writer.write(http_response(413, error_body('request body too large'), False))
+                    break
+                body = b''
+                try:
+                    if length:
+                        body = await asyncio.wait_for(reader.readexactly(length), self.keep_alive_timeout)
+                except asyncio.TimeoutError:
+                    writer.write(http_response(408, error_body('request body not received in time'), False))
+                    break
+
+                self._active_requests += 1
+                self._requests_done.clear()
+                try:
+                    status, payload = await self.route(method, target.split('?', 1)[0], body)
+                    keep_alive = (
+                        version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                        and not self._closing
+                    )
+                    writer.write(http_response(status, payload, keep_alive))
+                    # Waiting on the socket buffer stops slow readers from piling up responses
+                    await writer.drain()
+                finally:
+                    self._active_requests -= 1
+                    if not self._active_requests:
+                        self._requests_done.set()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+def http_response(status, body, keep_alive):
+    head = (
+        f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'
+        'Content-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        f'Connection: {"keep-alive" if keep_alive else "close"}\r\n'
+    )
+    if status == 503:
+        head += 'Retry-After: 1\r\n'
+    return head.encode('latin-1') + b'\r\n' + body
+
+
+async def serve(host, port, workers, queue_size):
+    service = PlannerService(workers=workers, queue_size=queue_size)
+    await service.start(host, port)
+    print(f'Planner service listening on http://{host}:{service.port} with {service.workers} workers')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON HTTP service for the Smart Diet & Workout Planner')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--workers', type=int, default=None, help='planning processes (default: CPU count)')
+    parser.add_argument('--queue-size', type=int, default=64, help='pending plans before answering 503')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
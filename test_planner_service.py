@@ -0,0 +1,360 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import planner_service
+from planner_service import PlannerService
+
+PROFILE = {
+    'age': 25,
+    'gender': 'Male',
+    'height': 170,
+    'weight': 70,
+    'activity_level': 'Moderately Active',
+    'goal': 'Weight Loss',
+}
+
+PLAN_REQUEST = {**PROFILE, 'diet_preference': 'Vegetarian', 'meal_frequency': 4, 'allergies': 'nuts'}
+
+
+# Send one raw HTTP request over a real socket and return (status, headers, body)
+async def http(port, method, path, body=b'', headers=None):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode('utf-8')
+    headers = {'Content-Length': str(len(body)), 'Connection': 'close', **(headers or {})}
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    head = f'{method} {path} HTTP/1.1\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in headers.items()) + '\r\n'
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+
+    head, _, payload = response.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    response_headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    return status, response_headers, json.loads(payload) if payload else None
+
+
+def run_service(test, **options):
+    async def runner():
+        service = PlannerService(**options)
+        await service.start('127.0.0.1', 0)
+        try:
+            return await test(service)
+        finally:
+            await service.close()
+    return asyncio.run(runner())
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self, max_workers=1):
+        super().__init__(max_workers=max_workers)
+        self.calls = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.calls += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+def blocking_job(release):
+    def job(params):
+        release.wait(5)
+        return {'done': True}
+    return job
+
+
+async def wait_until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('condition never became true')
+
+
+# Endpoints against the real planner, planned inside ProcessPoolExecutor workers
+def test_endpoints_with_real_planner():
+    async def test(service):
+        status, _, calories = await http(service.port, 'POST', '/calories', PROFILE)
+        assert status == 200
+        assert calories == {'target_calories': 2045, 'bmr': 1642}
+
+        status, _, plan = await http(service.port, 'POST', '/plan', PLAN_REQUEST)
+        assert status == 200
+        assert plan['target_calories'] == 2045
+        assert plan['bmi'] == 24.2
+        assert set(plan['meal_plan']) == {'breakfast', 'lunch', 'dinner', 'snack'}
+        for food in plan['meal_plan'].values():
+            assert set(food) == set(planner_service.FOOD_FIELDS)
+            assert type(food['calories_per_serving']) is int
+            assert 'almonds' not in food['food_name'].lower()
+        assert plan['grocery_list'] == sorted(plan['grocery_list'])
+
+        macros = plan['macros']
+        status, _, meals = await http(service.port, 'POST', '/meal-plan', {
+            'target_calories': plan['target_calories'],
+            'protein_target': macros['protein_g'],
+            'carbs_target': macros['carbs_g'],
+            'fat_target': macros['fat_g'],
+            'diet_preference': 'Vegetarian',
+            'meal_frequency': 4,
+            'allergies': 'nuts',
+        })
+        assert status == 200
+        assert meals['meal_plan'] == plan['meal_plan']
+
+        status, _, groceries = await http(service.port, 'POST', '/grocery-list', {'meal_plan': plan['meal_plan']})
+        assert status == 200
+        assert groceries['grocery_list'] == plan['grocery_list']
+
+        status, _, workouts = await http(service.port, 'POST', '/workout-plan', {'goal': 'Muscle Gain'})
+        assert status == 200
+        assert workouts['workout_plan']['monday'].startswith('Upper body strength')
+        assert plan['workout_plan']['monday'].startswith('Cardio')
+
+        status, _, health = await http(service.port, 'GET', '/health')
+        assert status == 200
+        assert health['status'] == 'ok'
+
+    run_service(test, workers=1)
+
+
+def test_identical_concurrent_requests_share_one_computation(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setitem(planner_service.ENDPOINTS, '/workout-plan', (blocking_job(release), {'goal': str}))
+    executor = CountingExecutor(max_workers=2)
+
+    async def test(service):
+        requests = [
+            asyncio.create_task(http(service.port, 'POST', '/workout-plan', {'goal': 'Weight Loss'}))
+            for _ in range(10)
+        ]
+        await wait_until(lambda: executor.calls == 1)
+        await asyncio.sleep(0.1)
+        release.set()
+        results = await asyncio.gather(*requests)
+        assert [status for status, _, _ in results] == [200] * 10
+        assert all(body == {'done': True} for _, _, body in results)
+        assert executor.calls == 1
+
+    try:
+        run_service(test, executor=executor)
+    finally:
+        release.set()
+        executor.shutdown()
+    assert executor.calls == 1
+
+
+def test_full_queue_returns_503_with_retry_after(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setitem(planner_service.ENDPOINTS, '/workout-plan', (blocking_job(release), {'goal': str}))
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def test(service):
+        running = asyncio.create_task(http(service.port, 'POST', '/workout-plan', {'goal': 'a'}))
+        await wait_until(lambda: len(service._inflight) == 1 and service._queue.empty())
+        queued = asyncio.create_task(http(service.port, 'POST', '/workout-plan', {'goal': 'b'}))
+        await wait_until(lambda: service._queue.full())
+
+        status, headers, body = await http(service.port, 'POST', '/workout-plan', {'goal': 'c'})
+        assert status == 503
+        assert headers['retry-after'] == '1'
+        assert body == {'error': 'planner is busy, retry shortly'}
+
+        release.set()
+        assert (await running)[0] == 200
+        assert (await queued)[0] == 200
+
+    try:
+        run_service(test, executor=executor, queue_size=1)
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_batch_splices_mixed_results():
+    async def test(service):
+        status, _, body = await http(service.port, 'POST', '/batch', {'requests': [
+            {'endpoint': '/calories', 'params': PROFILE},
+            {'endpoint': '/calories', 'params': {'age': 25}},
+            {'endpoint': '/nope', 'params': {}},
+            {'endpoint': '/workout-plan', 'params': {'goal': 'Maintenance'}},
+            {'endpoint': '/calories', 'params': PROFILE},
+        ]})
+        assert status == 200
+        statuses = [result['status'] for result in body['results']]
+        assert statuses == [200, 400, 404, 200, 200]
+        assert body['results'][4] == body['results'][0]
+        assert body['results'][0]['body'] == {'target_calories': 2045, 'bmr': 1642}
+        assert body['results'][1]['body'] == {'error': 'missing field: gender'}
+        assert body['results'][3]['body']['workout_plan']['wednesday'].startswith('Flexibility')
+
+        status, _, body = await http(service.port, 'POST', '/batch', {'requests': [{'endpoint': '/calories'}] * 6})
+        assert status == 413
+
+    run_service(test, workers=1, max_batch=5)
+
+
+def test_batch_that_does_not_fit_is_rejected_whole(monkeypatch):
+    executor = CountingExecutor()
+
+    async def test(service):
+        status, headers, body = await http(service.port, 'POST', '/batch', {'requests': [
+            {'endpoint': '/workout-plan', 'params': {'goal': goal}} for goal in ['a', 'b', 'c']
+        ]})
+        assert status == 503
+        assert headers['retry-after'] == '1'
+        assert executor.calls == 0
+
+    try:
+        run_service(test, executor=executor, queue_size=2)
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.parametrize('field, value', [
+    ('height', 0),
+    ('weight', -500),
+    ('age', 81),
+    ('meal_frequency', 7),
+    ('meal_frequency', 2),
+    ('age', True),
+    ('gender', 1),
+])
+def test_out_of_range_values_are_rejected(field, value):
+    async def test(service):
+        status, _, body = await http(service.port, 'POST', '/plan', {**PLAN_REQUEST, field: value})
+        assert status == 400
+        assert body['error'].startswith(f'invalid field: {field}')
+
+    run_service(test, executor=CountingExecutor())
+
+
+def test_error_responses():
+    async def test(service):
+        port = service.port
+        assert (await http(port, 'POST', '/plan', b'{"age": NaN}'))[0] == 400
+        assert (await http(port, 'POST', '/plan', b'{"weight": Infinity}'))[0] == 400
+        status, _, body = await http(port, 'POST', '/plan', json.dumps(PLAN_REQUEST).replace('"weight": 70', '"weight": 1e400').encode())
+        assert (status, body) == (400, {'error': 'invalid field: weight (must be between 40 and 150)'})
+        assert (await http(port, 'POST', '/plan', b'not json'))[0] == 400
+        assert (await http(port, 'POST', '/plan', [1, 2]))[0] == 400
+        status, _, body = await http(port, 'POST', '/plan', b'[' * 50000)
+        assert (status, body) == (400, {'error': 'request body is not valid JSON'})
+        assert (await http(port, 'POST', '/unknown', {}))[0] == 404
+        assert (await http(port, 'GET', '/plan'))[0] == 405
+        assert (await http(port, 'POST', '/health'))[0] == 405
+        assert (await http(port, 'POST', '/plan', b'{}', {'Content-Length': '999999'}))[0] == 413
+
+        status, _, body = await http(port, 'POST', '/plan', b'', {
+            'Transfer-Encoding': 'chunked', 'Content-Length': '0',
+        })
+        assert status == 411
+
+    run_service(test, executor=CountingExecutor())
+
+
+def test_free_text_is_not_treated_as_regex():
+    async def test(service):
+        status, _, body = await http(service.port, 'POST', '/plan', {**PLAN_REQUEST, 'diet_preference': '['})
+        assert (status, body) == (400, {'error': 'invalid field: diet_preference'})
+
+        for allergies in ['(', 'c++', 'nuts, [dairy']:
+            status, _, body = await http(service.port, 'POST', '/plan', {**PLAN_REQUEST, 'allergies': allergies})
+            assert status == 200
+            assert set(body['meal_plan']) == {'breakfast', 'lunch', 'dinner', 'snack'}
+
+        # Escaping must not break ordinary comma separated keywords
+        status, _, body = await http(service.port, 'POST', '/plan', {**PLAN_REQUEST, 'allergies': 'curd, rice'})
+        assert status == 200
+        for food in body['meal_plan'].values():
+            assert 'curd' not in food['food_name'].lower()
+            assert 'rice' not in food['food_name'].lower()
+
+    run_service(test, workers=1)
+
+
+def test_planning_errors_are_not_leaked(monkeypatch):
+    def broken(params):
+        raise RuntimeError('secret internals')
+    monkeypatch.setitem(planner_service.ENDPOINTS, '/workout-plan', (broken, {'goal': str}))
+
+    async def test(service):
+        status, _, body = await http(service.port, 'POST', '/workout-plan', {'goal': 'x'})
+        assert status == 500
+        assert body == {'error': 'planning failed'}
+
+    run_service(test, executor=CountingExecutor())
+
+
+def test_incomplete_body_times_out():
+    async def test(service):
+        reader, writer = await asyncio.open_connection('127.0.0.1', service.port)
+        writer.write(b'POST /plan HTTP/1.1\r\nContent-Length: 20\r\n\r\n{"age":2')
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        assert response.startswith(b'HTTP/1.1 408 ')
+
+    run_service(test, executor=CountingExecutor(), keep_alive_timeout=0.2)
+
+
+def test_close_answers_pending_requests(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setitem(planner_service.ENDPOINTS, '/workout-plan', (blocking_job(release), {'goal': str}))
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def test():
+        service = PlannerService(executor=executor, queue_size=4)
+        await service.start('127.0.0.1', 0)
+        pending = [asyncio.create_task(service.submit('/workout-plan', {'goal': goal})) for goal in 'abc']
+        await wait_until(lambda: service._queue.qsize() == 2)
+        await asyncio.wait_for(service.close(), 5)
+        results = await asyncio.wait_for(asyncio.gather(*pending), 5)
+        assert [status for status, _ in results] == [503, 503, 503]
+
+    try:
+        asyncio.run(test())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_close_sends_503_to_waiting_clients(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setitem(planner_service.ENDPOINTS, '/workout-plan', (blocking_job(release), {'goal': str}))
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def test():
+        service = PlannerService(executor=executor, queue_size=4)
+        await service.start('127.0.0.1', 0)
+        clients = [
+            asyncio.create_task(http(service.port, 'POST', '/workout-plan', {'goal': goal}))
+            for goal in 'abc'
+        ]
+        await wait_until(lambda: len(service._inflight) == 3 and service._queue.qsize() == 2)
+        await asyncio.wait_for(service.close(), 5)
+        results = await asyncio.wait_for(asyncio.gather(*clients), 5)
+        assert [status for status, _, _ in results] == [503, 503, 503]
+        assert all(body == {'error': 'planner is shutting down'} for _, _, body in results)
+
+    try:
+        asyncio.run(test())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_dispatchers_follow_custom_executor():
+    executor = ThreadPoolExecutor(max_workers=3)
+    try:
+        assert PlannerService(executor=executor).workers == 3
+    finally:
+        executor.shutdown()